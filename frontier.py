@@ -0,0 +1,186 @@
+from typing import Dict, Iterable, List, Optional, Set
+import hashlib
+import math
+import os
+from config import load_settings
+
+
+class BloomFilter:
+    def __init__(self, expected_items: int, false_positive_rate: float) -> None:
+        """
+        Initializes the BloomFilter class sized for the expected number of items.
+
+        Parameters:
+            expected_items (int): The number of items the filter is sized for.
+            false_positive_rate (float): The accepted false positive rate at that size.
+
+        Returns:
+            None
+        """
+        self.capacity = expected_items
+        self.count = 0
+        self.size = max(8, int(-expected_items * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / expected_items * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def get_positions(self, item: str) -> Iterable[int]:
+        """
+        Returns the bit positions of the item using double hashing of one blake2b digest.
+        """
+        digest: bytes = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        first: int = int.from_bytes(digest[:8], 'little')
+        second: int = int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        """
+        Sets the bits of the item.
+        """
+        self.count += 1
+        for position in self.get_positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.get_positions(item))
+
+
+class UrlFrontier:
+    def __init__(self, settings: Optional[Dict] = None) -> None:
+        """
+        Initializes the UrlFrontier class which lets every detail URL through only once per run.
+
+        Seen URLs are kept in a set. When the set grows past 'set_limit' they are moved to
+        Bloom filters, which keep memory low for very large crawls. A Bloom filter can report
+        a URL that was not seen yet as seen, so such a URL is dropped and its detail page is
+        not fetched. Each time the current filter is full, a new filter with twice the
+        capacity and half the false positive rate is added. This keeps the overall rate of
+        dropped URLs below twice 'bloom_false_positive_rate' however large the crawl grows.
+
+        Parameters:
+            settings (Dict, optional): The 'frontier_settings' section of the config file.
+                Loaded from the config file if not given.
+
+        Returns:
+            None
+        """
+        if settings is None:
+            settings = load_settings().get('frontier_settings', {})
+        self.set_limit: int = settings.get('set_limit', 1000000)
+        self.expected_items: int = settings.get('bloom_expected_items', 10000000)
+        self.false_positive_rate: float = settings.get('bloom_false_positive_rate', 0.001)
+        self.seen_urls: Set[str] = set()
+        self.blooms: List[BloomFilter] = []
+        self.count = 0
+
+    def add(self, url: str) -> bool:
+        """
+        Marks the URL as seen.
+
+        Args:
+            url (str): The URL to add.
+
+        Returns:
+            bool: True if the URL was not seen before and should be queued, False otherwise.
+        """
+        if url in self:
+            return False
+        if self.blooms:
+            bloom: BloomFilter = self.blooms[-1]
+            if bloom.count >= bloom.capacity:
+                bloom = self.add_bloom()
+            bloom.add(url)
+        else:
+            self.seen_urls.add(url)
+            if len(self.seen_urls) > self.set_limit:
+                self.move_to_bloom()
+        self.count += 1
+        return True
+
+    def move_to_bloom(self) -> None:
+        """
+        Moves the seen URLs from the set to a Bloom filter.
+        """
+        bloom: BloomFilter = self.add_bloom()
+        for url in self.seen_urls:
+            bloom.add(url)
+        self.seen_urls = set()
+
+    def add_bloom(self) -> BloomFilter:
+        """
+        Adds a Bloom filter with twice the capacity and half the false positive rate of the previous one.
+
+        Returns:
+            BloomFilter: The new filter, which takes all following URLs.
+        """
+        if self.blooms:
+            capacity: int = self.blooms[-1].capacity * 2
+        else:
+            capacity: int = max(self.expected_items, len(self.seen_urls) * 2)
+        bloom: BloomFilter = BloomFilter(capacity, self.false_positive_rate * 0.5 ** len(self.blooms))
+        self.blooms.append(bloom)
+        return bloom
+
+    def __contains__(self, url: str) -> bool:
+        if self.blooms:
+            return any(url in bloom for bloom in self.blooms)
+        return url in self.seen_urls
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class OfferIndex:
+    def __init__(self, path: Optional[str] = None) -> None:
+        """
+        Initializes the OfferIndex class with the hashes of offers emitted in previous runs.
+
+        An offer is identified by the hash of its book URL, username and price, so an offer
+        is emitted again only when it is new or its price changed.
+
+        Parameters:
+            path (str, optional): The path of the index file. Loaded from the config file if not given.
+
+        Returns:
+            None
+        """
+        if path is None:
+            path = load_settings().get('frontier_settings', {}).get('offer_index_path')
+        self.path = path
+        self.hashes: Set[str] = set()
+        if self.path and os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.hashes = {line.strip() for line in file if line.strip()}
+
+    @staticmethod
+    def get_hash(book_url: str, username: str, cena: str) -> str:
+        """
+        Returns the hash identifying an offer.
+        """
+        return hashlib.sha1(f'{book_url}\x1f{username}\x1f{cena}'.encode('utf-8')).hexdigest()
+
+    def filter_new(self, detail_data: Dict[str, List]) -> Dict[str, List]:
+        """
+        Drops the offers that were already emitted and marks the remaining ones as emitted.
+
+        Args:
+            detail_data (Dict[str, List]): The offers as returned by DataScraper.get_url_details.
+
+        Returns:
+            Dict[str, List]: The offers that were not emitted before, in the same format.
+        """
+        new_rows: List[int] = []
+        for row, offer in enumerate(zip(detail_data['book_url'], detail_data['username'], detail_data['cena'])):
+            offer_hash: str = self.get_hash(*offer)
+            if offer_hash not in self.hashes:
+                self.hashes.add(offer_hash)
+                new_rows.append(row)
+        return {key: [values[row] for row in new_rows] for key, values in detail_data.items()}
+
+    def save(self) -> None:
+        """
+        Writes the index to its file so the next run skips the offers emitted in this one.
+        """
+        if not self.path:
+            return
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.writelines(f'{offer_hash}\n' for offer_hash in sorted(self.hashes))
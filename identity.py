@@ -0,0 +1,217 @@
+from typing import Dict, List, Optional
+import random
+import re
+from config import load_settings
+from session import get_session_manager
+
+
+# sec-ch-ua sent by default, by Chromium major version. Versions not listed here send no
+# client hints rather than a brand list or hint set that no real browser of that version sent.
+CLIENT_HINT_BRANDS: Dict[int, str] = {
+    91: '" Not;A Brand";v="99", "{brand}";v="91", "Chromium";v="91"',
+}
+
+
+class Identity:
+    def __init__(self, user_agent: str, accept_language: str, accept_encoding: str) -> None:
+        """
+        Initializes the Identity class with a consistent browser fingerprint.
+
+        Parameters:
+            user_agent (str): The User-Agent header of the identity.
+            accept_language (str): The Accept-Language header of the identity.
+            accept_encoding (str): The Accept-Encoding header of the identity.
+
+        Returns:
+            None
+        """
+        self.user_agent = user_agent
+        self.accept_language = accept_language
+        self.accept_encoding = accept_encoding
+        self.headers = self.build_headers()
+        self.requests = 0
+        self.blocks = 0
+
+    def build_headers(self) -> Dict[str, str]:
+        """
+        Builds the header set sent with every request of the identity.
+
+        Client hints (sec-ch-ua, sec-ch-ua-mobile) are only sent for Chromium based user agents
+        whose major version is in CLIENT_HINT_BRANDS, matching what that version sent by default.
+
+        Returns:
+            Dict[str, str]: The headers of the identity.
+        """
+        headers: Dict[str, str] = {
+            "User-Agent": self.user_agent,
+            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            "Accept-Language": self.accept_language,
+            "Accept-Encoding": self.accept_encoding,
+        }
+        chrome_version: Optional[re.Match] = re.search(r'Chrome/(\d+)', self.user_agent)
+        brands: Optional[str] = CLIENT_HINT_BRANDS.get(int(chrome_version.group(1))) if chrome_version else None
+        if brands:
+            brand: str = "Microsoft Edge" if 'Edg/' in self.user_agent else "Google Chrome"
+            headers["sec-ch-ua"] = brands.format(brand=brand)
+            headers["sec-ch-ua-mobile"] = "?1" if 'Mobile' in self.user_agent else "?0"
+        return headers
+
+    @property
+    def block_rate(self) -> float:
+        """
+        Returns the share of requests of the identity that were blocked.
+        """
+        return self.blocks / self.requests if self.requests else 0.0
+
+
+class IdentityManager:
+    def __init__(self, user_agents: List[str], settings: Optional[Dict] = None) -> None:
+        """
+        Initializes the IdentityManager class with the user agents to build identities from.
+
+        Every proxy gets one identity which is kept for the life of its session, so all
+        requests going through the same proxy connection look like one browser. The
+        identity is replaced when a block signal is seen on its proxy.
+
+        Parameters:
+            user_agents (List[str]): A list of user agents to build identities from.
+            settings (Dict, optional): The 'identity_settings' section of the config file.
+                Loaded from the config file if not given.
+
+        Returns:
+            None
+        """
+        if settings is None:
+            settings = load_settings().get('identity_settings', {})
+        self.user_agents = user_agents
+        self.accept_languages: List[str] = settings.get('accept_languages', ["cs-CZ,cs;q=0.9,en;q=0.8"])
+        self.block_status_codes: List[int] = settings.get('block_status_codes', [403, 429, 503])
+        self.block_markers: List[str] = [marker.lower() for marker in settings.get('block_markers', [])]
+        self.content_markers: List[str] = settings.get('content_markers', ['bookitem span2', 'span6 asmaro'])
+        self.identities: Dict[str, Identity] = {}
+        self.all_identities: List[Identity] = []
+
+    def create_identity(self, exclude: Optional[Identity] = None) -> Identity:
+        """
+        Creates a new identity with a random user agent and language.
+
+        Args:
+            exclude (Identity, optional): An identity whose user agent should not be reused.
+
+        Returns:
+            Identity: The new identity.
+        """
+        user_agents: List[str] = [ua for ua in self.user_agents if exclude is None or ua != exclude.user_agent]
+        identity: Identity = Identity(
+            user_agent=random.choice(user_agents or self.user_agents),
+            accept_language=random.choice(self.accept_languages),
+            accept_encoding=get_session_manager().accept_encoding,
+        )
+        self.all_identities.append(identity)
+        return identity
+
+    def get_identity(self, proxy: str) -> Identity:
+        """
+        Returns the identity bound to the given proxy, creating it on first use.
+
+        Args:
+            proxy (str): The proxy URL.
+
+        Returns:
+            Identity: The identity of the proxy.
+        """
+        if proxy not in self.identities:
+            self.identities[proxy] = self.create_identity()
+        return self.identities[proxy]
+
+    def rotate(self, proxy: str) -> Identity:
+        """
+        Replaces the identity of the given proxy and clears the cookies of its session.
+
+        Args:
+            proxy (str): The proxy URL.
+
+        Returns:
+            Identity: The new identity of the proxy.
+        """
+        self.identities[proxy] = self.create_identity(exclude=self.identities.get(proxy))
+        get_session_manager().clear_cookies(proxy)
+        return self.identities[proxy]
+
+    def is_blocked(self, status: int, text: Optional[str] = None) -> bool:
+        """
+        Checks whether a response looks like a block.
+
+        The body is checked for block markers (case-insensitive) only when none of the
+        content markers of a listing or detail page are found, so a real page that
+        mentions a marker in its text is not thrown away.
+
+        Args:
+            status (int): The HTTP status code of the response.
+            text (str, optional): The body of the response.
+
+        Returns:
+            bool: True if the response is a block signal, False otherwise.
+        """
+        if status in self.block_status_codes:
+            return True
+        if not text or any(marker in text for marker in self.content_markers):
+            return False
+        body: str = text.lower()
+        return any(marker in body for marker in self.block_markers)
+
+    def record(self, proxy: str, identity: Identity, blocked: bool) -> None:
+        """
+        Records the result of a request and rotates the identity of the proxy on a block.
+
+        The identity is rotated only if it is still bound to the proxy, so concurrent
+        requests blocked with the same identity rotate it once.
+
+        Args:
+            proxy (str): The proxy URL the request went through.
+            identity (Identity): The identity the request was sent with.
+            blocked (bool): Whether the response was a block signal.
+        """
+        identity.requests += 1
+        if blocked:
+            identity.blocks += 1
+            if self.identities.get(proxy) is identity:
+                self.rotate(proxy)
+
+    def get_stats(self) -> List[Dict]:
+        """
+        Returns the request count, block count and block rate of every identity used in the run.
+
+        Returns:
+            List[Dict]: A list of statistics, one per identity.
+        """
+        return [
+            {
+                'user_agent': identity.user_agent,
+                'accept_language': identity.accept_language,
+                'requests': identity.requests,
+                'blocks': identity.blocks,
+                'block_rate': identity.block_rate,
+            }
+            for identity in self.all_identities
+        ]
+
+
+# Identity manager shared by all ResponseScraper objects for the life of the process
+_identity_manager: Optional[IdentityManager] = None
+
+
+def get_identity_manager(user_agents: List[str]) -> IdentityManager:
+    """
+    Returns the process-wide IdentityManager, creating it on first use.
+
+    Args:
+        user_agents (List[str]): A list of user agents to build identities from.
+
+    Returns:
+        IdentityManager: The shared identity manager.
+    """
+    global _identity_manager
+    if _identity_manager is None:
+        _identity_manager = IdentityManager(user_agents)
+    return _identity_manager
@@ -1,5 +1,4 @@
-from typing import List
-from aiohttp_socks import ProxyConnector
+from typing import List, Optional
 import pandas as pd
 import random
 from datetime import datetime
@@ -8,11 +7,15 @@ import aiohttp
 from proxy import get_working_proxies, get_proxy
 from rich import print
 from scraper import DataScraper
+from frontier import UrlFrontier, OfferIndex
 from dotenv import load_dotenv
 import os
 import logging
 from logs import logger
 from config import load_settings
+from session import get_session_manager
+from identity import Identity, IdentityManager, get_identity_manager
+from status import CrawlControl, StatusServer, get_crawl_control
 
 
 # Load environment variables
@@ -26,7 +29,7 @@ logger = logger.get_logger(log_file=LOG_DIR_MAIN, log_level=logging.INFO)
 
 
 class ResponseScraper:
-    def __init__(self, urls: List, proxy_list: List, user_agents: List) -> None:
+    def __init__(self, urls: List, proxy_list: List, user_agents: List, working_proxies: Optional[List] = None, proxy: Optional[str] = None) -> None:
         """
         Initializes the ResponseScraper class with the given URLs, proxy list, and user agents.
 
@@ -34,6 +37,9 @@ class ResponseScraper:
             urls (List[str]): A list of URLs to scrape.
             proxy_list (List[str]): A list of proxies to use for the scraping.
             user_agents (List[str]): A list of user agents to use for the scraping.
+            working_proxies (List[str], optional): Proxies already tested by an earlier phase. If not given,
+                the proxies in `proxy_list` are tested before scraping.
+            proxy (str, optional): The proxy used by an earlier phase. If not given, a random working proxy is picked.
 
         Returns:
             None
@@ -43,27 +49,61 @@ class ResponseScraper:
         self.user_agents = user_agents
         self.one_page_response = None
         self.list_all_responses = []
-        self.working_proxies = []
+        self.working_proxies = working_proxies or []
+        self.proxy = proxy
 
-    async def fetch(self, url: str, session: aiohttp.ClientSession):
+    async def fetch(self, url: str, proxy: str):
         """
-        Asynchronously fetches a web page from the given URL using the provided session and proxy.
+        Asynchronously fetches a web page once the crawl control grants a slot for the request.
+
+        Waits while the crawl is paused or at its concurrency limit, and switches to another
+        live proxy if the given one was drained in the meantime.
+
+        Args:
+            url (str): The URL of the web page to fetch.
+            proxy (str): The preferred proxy to use for the request.
+
+        Returns:
+            str or None: The content of the fetched web page as a string, or None if the request failed or was blocked.
+        """
+        control: CrawlControl = get_crawl_control()
+        async with control.slot():
+            live_proxy: Optional[str] = control.get_live_proxy(proxy)
+            page: Optional[str] = None
+            if live_proxy is None:
+                logger.error(f"Error: Request failed: all proxies drained, url={url}")
+            else:
+                async with control.use_proxy(live_proxy):
+                    page = await self.fetch_page(url, live_proxy)
+            control.record(page is not None)
+            return page
+
+    async def fetch_page(self, url: str, proxy: str):
+        """
+        Asynchronously fetches a web page from the given URL using the shared session and identity of the proxy.
 
         Args:
             url (str): The URL of the web page to fetch.
-            session (aiohttp.ClientSession): The aiohttp client session to use for the request.
             proxy (str): The proxy to use for the request.
 
         Returns:
-            str or None: The content of the fetched web page as a string, or None if the request failed.
+            str or None: The content of the fetched web page as a string, or None if the request failed or was blocked.
         """
-        headers: dict = {"User-Agent": random.choice(self.user_agents)} # generate random user agent
+        session: aiohttp.ClientSession = get_session_manager().get_session(proxy)
+        identities: IdentityManager = get_identity_manager(self.user_agents)
+        identity: Identity = identities.get_identity(proxy)  # sticky headers of the proxy
         try:
             # logger.info(f"Requesting: {url}")
-            async with session.get(url=url, headers=headers, timeout=10) as response:
-                if response.status == 200:
+            async with session.get(url=url, headers=identity.headers, timeout=10) as response:
+                text: Optional[str] = await response.text() if response.status == 200 else None
+                blocked: bool = identities.is_blocked(response.status, text)
+                identities.record(proxy, identity, blocked)
+                if blocked:
+                    logger.error(f"Request blocked: {response.status}, url={response.url}, rotating identity of proxy {proxy}")
+                    return None
+                elif response.status == 200:
                     logger.info(f"Request successful: {url} - {response.status}")
-                    self.one_page_response = await response.text()
+                    self.one_page_response = text
                     return self.one_page_response
                 else:
                     logger.error(f"Request failed: {response.status}, message='{response.reason}', proxy_url={response.url}")
@@ -81,24 +121,31 @@ class ResponseScraper:
         """
         task_responses: List[asyncio.Task] = []
         
-        # Create a ProxyConnector with random proxy from proxy_list
-        connector = ProxyConnector.from_url(random.choice(self.working_proxies))
+        # Pick a random working proxy unless an earlier phase chose one, its keep-alive session is shared by all requests
+        if self.proxy is None:
+            self.proxy = random.choice(self.working_proxies)
         
-        async with aiohttp.ClientSession(connector=connector) as session:
-            for url in self.urls:
-                task_response = asyncio.create_task(self.fetch(url, session))
-                task_responses.append(task_response)
-            self.list_all_responses = await asyncio.gather(*task_responses)
+        # Add the URLs to the queue reported by the status server
+        get_crawl_control().add_urls(len(self.urls))
+        
+        for url in self.urls:
+            task_response = asyncio.create_task(self.fetch(url, self.proxy))
+            task_responses.append(task_response)
+        self.list_all_responses = await asyncio.gather(*task_responses)
         return self.list_all_responses
 
     async def test_proxies(self):
         self.working_proxies: List = await get_working_proxies(self.proxy_list)
+        get_crawl_control().set_proxies(self.working_proxies)
     
     async def main(self):
         """
         Main function to test proxies and fetch all pages.
+
+        Proxies are tested only if no working proxies were passed in.
         """
-        await self.test_proxies()  # Test proxy servers before scraping
+        if not self.working_proxies:
+            await self.test_proxies()  # Test proxy servers before scraping
         proxies_count: int = len(self.working_proxies)
         if not proxies_count:
             logger.info("No working proxies found.")
@@ -110,6 +157,98 @@ class ResponseScraper:
             return pages_responses
 
 
+async def crawl(urls: List, proxy_list: List, user_agents: List) -> List:
+    """
+    Fetches the listing pages and then the detail pages in a single event loop.
+
+    Proxies are tested once and one proxy is picked for both phases, so the keep-alive
+    connections to the target site opened while fetching listings are reused for the details.
+    If the web interface is enabled, a status server runs in the same event loop for the
+    duration of the crawl.
+
+    Args:
+        urls (List[str]): A list of listing page URLs.
+        proxy_list (List[str]): A list of proxies to use for the scraping.
+        user_agents (List[str]): A list of user agents to use for the scraping.
+
+    Returns:
+        List[str]: A list of HTML responses from the detail pages, empty if there are no pages to scrape.
+    """
+    # Start status server in the event loop of the crawler
+    status_server: Optional[StatusServer] = None
+    if load_settings()['user_interface'].get('enable_web_interface'):
+        status_server = StatusServer(get_crawl_control(), get_identity_manager(user_agents))
+        try:
+            await status_server.start()
+            logger.info(f"Status server running on http://{status_server.host}:{status_server.port}/status")
+        except OSError as e:
+            logger.error(f"Status server failed to start: {e}")
+            status_server = None
+    
+    try:
+        # Start time for responses
+        start_time_responses: datetime = datetime.now()
+        
+        # Create a ResponseScraper object with the list of URLs and proxies and user agents
+        response_scraper_urls: ResponseScraper = ResponseScraper(urls, proxy_list, user_agents)
+        
+        # Test proxies once, the detail phase reuses the working proxies and the chosen proxy
+        await response_scraper_urls.test_proxies()
+        if not response_scraper_urls.working_proxies:
+            logger.info("No working proxies found.")
+            return []
+        
+        # Create a list of responses
+        pages_responses: List = await response_scraper_urls.main()
+        
+        # End time for responses
+        end_time_responses: datetime = datetime.now()
+        logger.info(f'Elapsed time for responses: {end_time_responses - start_time_responses} seconds')
+        
+        # Counting responses that are None
+        count_none: int = sum(1 for response in pages_responses if response is None)
+        if count_none == len(pages_responses):
+            return []
+
+        # Start time for urls
+        start_time_urls: datetime = datetime.now()
+        
+        # Create a DataScraper object with the list of responses
+        results_all_urls: List = DataScraper(pages_responses, frontier=UrlFrontier()).get_url()
+        
+        # End time for urls
+        end_time_urls: datetime = datetime.now()
+        logger.info(f'Elapsed time for urls: {end_time_urls - start_time_urls} seconds')
+
+        # Start time for detail responses
+        start_time_detail_responses: datetime = datetime.now()
+        
+        # Create a ResponseScraper object with the list of urls and proxies and user agents
+        response_scraper_details: ResponseScraper = ResponseScraper(
+            results_all_urls, proxy_list, user_agents,
+            working_proxies=response_scraper_urls.working_proxies, proxy=response_scraper_urls.proxy,
+        )
+        
+        # Create a list of responses
+        all_responses_details: List = await response_scraper_details.main()
+        
+        # End time for detail responses
+        end_time_detail_responses: datetime = datetime.now()
+        logger.info(f'Elapsed time for detail responses: {end_time_detail_responses - start_time_detail_responses} seconds')
+        return all_responses_details
+    finally:
+        # Log block rate of every identity used in the run
+        for stats in get_identity_manager(user_agents).get_stats():
+            logger.info(f"Identity {stats['user_agent']} - requests: {stats['requests']}, blocks: {stats['blocks']}, block rate: {stats['block_rate']:.1%}")
+        
+        # Close all keep-alive sessions before the event loop ends
+        await get_session_manager().close()
+        
+        # Stop status server
+        if status_server is not None:
+            await status_server.stop()
+
+
 if __name__ == "__main__":
     # Create a list of URLs
     start_page: int = 1
@@ -123,50 +262,21 @@ if __name__ == "__main__":
     # List of User-Agents headers
     user_agents: List = load_settings()['scraping_settings']['user_agents']
     
-    # Start time for responses
-    start_time_responses: datetime = datetime.now()
-    
-    # Create a ResponseScraper object with the list of URLs and proxies and user agents
-    response_scraper_urls: ResponseScraper = ResponseScraper(urls, proxy_list, user_agents)
-    
-    # Create a list of responses
-    pages_responses: List = asyncio.run(response_scraper_urls.main())
-    
-    # End time for responses
-    end_time_responses: datetime = datetime.now()
-    logger.info(f'Elapsed time for responses: {end_time_responses - start_time_responses} seconds')
-    
-    # Number of responses in list of responses
-    num_responses: int = len(pages_responses)
-
-    # Counting responses that are None
-    count_none: int = sum(1 for response in pages_responses if response is None)
-    if count_none == num_responses:
+    # Fetch listing and detail pages over shared connections
+    all_responses_details: List = asyncio.run(crawl(urls, proxy_list, user_agents))
+    if not all_responses_details:
         print("No pages to scrape.")
         exit()
 
     else:
-        # Start time for urls
-        start_time_urls: datetime = datetime.now()
-        
-        # Create a DataScraper object with the list of responses
-        results_all_urls: List = DataScraper(pages_responses).get_url()
-        
-        # End time for urls
-        end_time_urls: datetime = datetime.now()
-        logger.info(f'Elapsed time for urls: {end_time_urls - start_time_urls} seconds')
-
         # Start time for details
         start_time_details: datetime = datetime.now()
         
-        # Create a ResponseScraper object with the list of urls and proxies and user agents
-        response_scraper_details: ResponseScraper = ResponseScraper(results_all_urls, proxy_list, user_agents)
+        # Index of offers emitted in previous runs
+        offer_index: OfferIndex = OfferIndex()
         
-        # Create a list of responses
-        all_responses_details: List = asyncio.run(response_scraper_details.main())
-
-        # Create a DataScraper object with the list of details
-        result_detail_data: List = DataScraper(all_responses_details).get_url_details()
+        # Create a DataScraper object with the list of details, leaving out unchanged offers
+        result_detail_data: List = DataScraper(all_responses_details, offer_index=offer_index).get_url_details()
 
         # End time for details
         end_time_details: datetime = datetime.now()
@@ -189,4 +299,7 @@ if __name__ == "__main__":
         
         # Save DataFrame to CSV file
         # df.to_csv('async-scrape-trhknih/trhknih.csv', index=False, encoding='utf-8-sig')
+        
+        # Mark offers as emitted only after they were output
+        offer_index.save()
 
@@ -11,6 +11,7 @@ from config import load_settings
 import aiohttp
 import asyncio
 import random
+from session import get_session_manager
 
 
 # Load environment variables
@@ -64,20 +65,24 @@ async def test_proxy(proxy: str):
     Notes:
         - The public endpoint used for testing is "http://httpbin.org/ip".
         - SSL verification is turned off for testing purposes.
+        - The request goes through the shared session of the proxy. Connections are pooled per target host, so the
+          tunnel to the check URL is not reused for scraping, only the session and its settings are.
         - The function logs the working proxy and any errors encountered.
     """
     # Load path from config file
     url: str = load_settings()['proxy_settings']['proxy_check_url']  # You can use any public endpoint that returns an IP
     try:
-        connector: aiohttp.BaseConnector = aiohttp.TCPConnector(ssl=False, limit=100)  # Turn off SSL verification for testing
-        async with aiohttp.ClientSession(connector=connector) as session:
-            # logger.info(f"Testing proxy: {proxy}")
-            async with session.get(url=url, proxy=proxy, timeout=10) as response:
-                if response.status == 200:
-                    logger.info(f"Proxy {proxy} working")
-                    return proxy
+        # Shared session for the proxy, the scraper later uses the same session
+        session: aiohttp.ClientSession = get_session_manager().get_session(proxy)
+        # logger.info(f"Testing proxy: {proxy}")
+        async with session.get(url=url, ssl=False, timeout=10) as response:  # Turn off SSL verification for testing
+            if response.status == 200:
+                logger.info(f"Proxy {proxy} working")
+                return proxy
     except Exception as e:
         logger.error(f"Proxy {proxy} failed: {e}")
+    # Drop the session of a dead proxy so it does not hold connections
+    await get_session_manager().close_session(proxy)
     return None
 
 async def get_working_proxies(proxy_list: list):
@@ -1,12 +1,13 @@
 from multiprocessing import Pool
 import numpy as np
 from bs4 import BeautifulSoup
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import logging
 from logs import logger
 from config import load_settings
 from dotenv import load_dotenv
+from frontier import UrlFrontier, OfferIndex
 
 
 # Load environment variables
@@ -20,28 +21,33 @@ logger = logger.get_logger(log_file=LOG_DIR_SCRAPING, log_level=logging.INFO)
 
 
 class DataScraper:
-    def __init__(self, pages_responses: List[str]) -> None:
+    def __init__(self, pages_responses: List[str], frontier: Optional[UrlFrontier] = None, offer_index: Optional[OfferIndex] = None) -> None:
         """
         Initializes a new instance of the class.
 
         Args:
             pages_responses (List[str]): A list of HTML responses from web pages.
+            frontier (UrlFrontier, optional): The frontier of detail URLs already queued in this run.
+                A new one is created if not given.
+            offer_index (OfferIndex, optional): The index of offers already emitted. If not given, all offers are emitted.
 
         Returns:
             None
 
-        Initializes the instance variables `pages_responses`, `base_url`, and `results_all_urls` with the given values.
+        Initializes the instance variables `pages_responses`, `base_url`, `results_all_urls`, `frontier` and `offer_index` with the given values.
         """
         self.pages_responses = pages_responses
         self.base_url = load_settings()['scraping_settings']['base_url']
         self.results_all_urls = []
+        self.frontier = frontier if frontier is not None else UrlFrontier()
+        self.offer_index = offer_index
         
     
     def get_url(self):
         """
         This function scrapes URLs from the pages in `self.pages_responses` and appends them to `self.results_all_urls`.
 
-        It iterates over each response in `self.pages_responses` and checks if it is not empty. If it is not empty, it creates a BeautifulSoup object from the response and finds all the elements with the class 'bookitem span2'. It then iterates over each of these elements and finds the 'href' attribute of the 'a' tag with the class 'title-name'. The found URL is appended to `self.results_all_urls`.
+        It iterates over each response in `self.pages_responses` and checks if it is not empty. If it is not empty, it creates a BeautifulSoup object from the response and finds all the elements with the class 'bookitem span2'. It then iterates over each of these elements and finds the 'href' attribute of the 'a' tag with the class 'title-name'. The found URL is appended to `self.results_all_urls` unless it is already in `self.frontier`, so every detail URL is queued only once per run.
 
         The function returns `self.results_all_urls`, which contains all the scraped URLs.
 
@@ -56,7 +62,9 @@ class DataScraper:
                 soup: BeautifulSoup = BeautifulSoup(response, 'html.parser')
                 start_point: List = soup.find_all('div', class_='bookitem span2')
                 for url in start_point:
-                    self.results_all_urls.append(self.base_url + url.find('a', class_='title-name').get('href'))
+                    book_url: str = self.base_url + url.find('a', class_='title-name').get('href')
+                    if self.frontier.add(book_url):
+                        self.results_all_urls.append(book_url)
         logger.info(f'Number of URLs: {len(self.results_all_urls)}')
         return self.results_all_urls
     
@@ -91,6 +99,8 @@ class DataScraper:
                 - 'isbn4' (list): List of fifth ISBN.
                 - 'isbn5' (list): List of sixth ISBN.
                 - 'book_url' (list): List of book URLs.
+
+            If `self.offer_index` is set, offers already emitted in this or a previous run are left out.
         """
         detail_data = {
             'username': [],
@@ -255,6 +265,9 @@ class DataScraper:
                         detail_data['isbn5'].append(np.nan)
                 except:
                     detail_data['isbn5'].append(np.nan)
+        if self.offer_index is not None:
+            detail_data = self.offer_index.filter_new(detail_data)
+            logger.info(f'Number of new offers: {len(detail_data["book_url"])}')
         return detail_data
     
     
\ No newline at end of file
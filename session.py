@@ -0,0 +1,126 @@
+from typing import Dict, Optional
+from aiohttp_socks import ProxyConnector
+import aiohttp
+from config import load_settings
+
+
+class SessionManager:
+    def __init__(self, settings: Optional[Dict] = None) -> None:
+        """
+        Initializes the SessionManager class with connection settings.
+
+        The manager owns one long-lived ClientSession per proxy for the life of the process.
+        Every session keeps its connections alive between requests. Connections are pooled
+        per target host, so the listing and detail fetch through the same proxy reuse the
+        tunnels to the target site instead of paying the handshake through the proxy again.
+
+        Parameters:
+            settings (Dict, optional): The 'session_settings' section of the config file.
+                Loaded from the config file if not given.
+
+        Returns:
+            None
+        """
+        if settings is None:
+            settings = load_settings().get('session_settings', {})
+        self.limit: int = settings.get('limit', 100)
+        self.limit_per_host: int = settings.get('limit_per_host', 0)
+        self.keepalive_timeout: float = settings.get('keepalive_timeout', 60)
+        self.accept_encoding: str = settings.get('accept_encoding', 'gzip, deflate')
+        self.sessions: Dict[str, aiohttp.ClientSession] = {}
+
+    def create_connector(self, proxy: str) -> aiohttp.BaseConnector:
+        """
+        Creates a keep-alive connector that tunnels through the given proxy.
+
+        The target host name is resolved by the proxy, so there is no local DNS lookup to cache.
+
+        A 'limit_per_host' of 0 leaves the connections to one host uncapped, all requests of a
+        phase go through one proxy to one host and would otherwise queue in the pool.
+
+        Args:
+            proxy (str): The proxy URL, e.g. 'http://1.2.3.4:8080'.
+
+        Returns:
+            aiohttp.BaseConnector: The connector for the proxy.
+        """
+        return ProxyConnector.from_url(
+            proxy,
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+        )
+
+    def get_session(self, proxy: str) -> aiohttp.ClientSession:
+        """
+        Returns the session bound to the given proxy, creating it on first use.
+
+        Must be called from within a running event loop.
+
+        Args:
+            proxy (str): The proxy URL.
+
+        Returns:
+            aiohttp.ClientSession: The shared session for the proxy.
+        """
+        session: Optional[aiohttp.ClientSession] = self.sessions.get(proxy)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(
+                connector=self.create_connector(proxy),
+                headers={"Accept-Encoding": self.accept_encoding},
+                auto_decompress=True,
+            )
+            self.sessions[proxy] = session
+        return session
+
+    def clear_cookies(self, proxy: str) -> None:
+        """
+        Clears the cookie jar of the session bound to the given proxy.
+
+        Args:
+            proxy (str): The proxy URL.
+        """
+        session: Optional[aiohttp.ClientSession] = self.sessions.get(proxy)
+        if session is not None:
+            session.cookie_jar.clear()
+
+    async def close_session(self, proxy: str) -> None:
+        """
+        Closes the session bound to the given proxy and drops its connections.
+
+        Args:
+            proxy (str): The proxy URL.
+        """
+        session: Optional[aiohttp.ClientSession] = self.sessions.pop(proxy, None)
+        if session is not None and not session.closed:
+            await session.close()
+
+    async def close(self) -> None:
+        """
+        Closes all sessions owned by the manager.
+        """
+        for proxy in list(self.sessions):
+            await self.close_session(proxy)
+
+    async def __aenter__(self) -> 'SessionManager':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+# Session manager shared by proxy.py and main.py for the life of the process
+_session_manager: Optional[SessionManager] = None
+
+
+def get_session_manager() -> SessionManager:
+    """
+    Returns the process-wide SessionManager, creating it on first use.
+
+    Returns:
+        SessionManager: The shared session manager.
+    """
+    global _session_manager
+    if _session_manager is None:
+        _session_manager = SessionManager()
+    return _session_manager
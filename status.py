@@ -0,0 +1,296 @@
+from typing import AsyncIterator, Dict, List, Optional
+from contextlib import asynccontextmanager
+from datetime import datetime
+from aiohttp import web
+import asyncio
+import random
+from config import load_settings
+from identity import IdentityManager
+from session import get_session_manager
+
+
+class CrawlControl:
+    def __init__(self, concurrency_limit: int) -> None:
+        """
+        Initializes the CrawlControl class which tracks the progress of a crawl and holds its runtime controls.
+
+        Every request takes a slot before it starts. A slot is granted only while the crawl
+        is not paused and fewer than `concurrency_limit` requests are in flight, so pausing
+        or lowering the limit lets in-flight requests finish without losing them. The slot
+        limit is the only per-proxy gate, the connectors have no per-host cap and allow up
+        to 'session_settings.limit' connections, so the limit cannot be set above that.
+
+        Parameters:
+            concurrency_limit (int): The maximum number of requests in flight.
+
+        Returns:
+            None
+        """
+        self.concurrency_limit = concurrency_limit
+        self.paused = False
+        self.condition = asyncio.Condition()
+        self.start_time: Optional[datetime] = None
+        self.total = 0
+        self.started = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.proxies: List[str] = []
+        self.drained_proxies: List[str] = []
+        self.proxy_active: Dict[str, int] = {}
+
+    def add_urls(self, count: int) -> None:
+        """
+        Adds the URLs of a crawl phase to the queue.
+
+        Args:
+            count (int): The number of queued URLs.
+        """
+        if self.start_time is None:
+            self.start_time = datetime.now()
+        self.total += count
+
+    def set_proxies(self, proxies: List[str]) -> None:
+        """
+        Sets the working proxies of the crawl, drained proxies stay drained.
+
+        Args:
+            proxies (List[str]): A list of working proxies.
+        """
+        self.proxies = list(proxies)
+
+    @property
+    def live_proxies(self) -> List[str]:
+        return [proxy for proxy in self.proxies if proxy not in self.drained_proxies]
+
+    def get_live_proxy(self, proxy: str) -> Optional[str]:
+        """
+        Returns the given proxy if it is not drained, otherwise a random live proxy.
+
+        Args:
+            proxy (str): The preferred proxy.
+
+        Returns:
+            str or None: A live proxy, or None if all proxies are drained.
+        """
+        live_proxies: List[str] = self.live_proxies
+        if proxy in live_proxies:
+            return proxy
+        return random.choice(live_proxies) if live_proxies else None
+
+    async def drain_proxy(self, proxy: str) -> bool:
+        """
+        Stops sending new requests through the proxy, requests in flight on it are finished.
+
+        The keep-alive session of the proxy is closed as soon as it has no requests in flight.
+
+        Args:
+            proxy (str): The proxy to drain.
+
+        Returns:
+            bool: True if the proxy is a working proxy of the crawl, False otherwise.
+        """
+        if proxy not in self.proxies:
+            return False
+        if proxy not in self.drained_proxies:
+            self.drained_proxies.append(proxy)
+        if not self.proxy_active.get(proxy):
+            await get_session_manager().close_session(proxy)
+        return True
+
+    @asynccontextmanager
+    async def use_proxy(self, proxy: str) -> AsyncIterator[None]:
+        """
+        Counts a request in flight on the proxy and closes its session if it was drained and this was the last one.
+        """
+        self.proxy_active[proxy] = self.proxy_active.get(proxy, 0) + 1
+        try:
+            yield
+        finally:
+            self.proxy_active[proxy] -= 1
+            if proxy in self.drained_proxies and not self.proxy_active[proxy]:
+                await get_session_manager().close_session(proxy)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Waits until the crawl is running and below the concurrency limit and holds a slot for one request.
+        """
+        async with self.condition:
+            await self.condition.wait_for(lambda: not self.paused and self.active < self.concurrency_limit)
+            self.active += 1
+            self.started += 1
+        try:
+            yield
+        finally:
+            async with self.condition:
+                self.active -= 1
+                self.condition.notify_all()
+
+    def record(self, success: bool) -> None:
+        """
+        Records the result of a finished request.
+
+        Args:
+            success (bool): Whether the request returned a page.
+        """
+        if success:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    async def pause(self) -> None:
+        async with self.condition:
+            self.paused = True
+
+    async def resume(self) -> None:
+        async with self.condition:
+            self.paused = False
+            self.condition.notify_all()
+
+    async def set_concurrency_limit(self, limit: int) -> None:
+        async with self.condition:
+            self.concurrency_limit = limit
+            self.condition.notify_all()
+
+    def get_status(self) -> Dict:
+        """
+        Returns the progress of the crawl.
+
+        Returns:
+            Dict: Queue depth, throughput in requests per second, error rate, live proxy count and
+                the ETA in seconds of the queued URLs.
+        """
+        finished: int = self.completed + self.failed
+        elapsed: float = (datetime.now() - self.start_time).total_seconds() if self.start_time else 0.0
+        throughput: float = finished / elapsed if elapsed else 0.0
+        queue_depth: int = self.total - self.started
+        return {
+            'state': 'paused' if self.paused else 'running',
+            'queue_depth': queue_depth,
+            'in_flight': self.active,
+            'completed': self.completed,
+            'failed': self.failed,
+            'throughput': throughput,
+            'error_rate': self.failed / finished if finished else 0.0,
+            'eta_seconds': (queue_depth + self.active) / throughput if throughput else None,
+            'concurrency_limit': self.concurrency_limit,
+            'live_proxies': len(self.live_proxies),
+            'drained_proxies': self.drained_proxies,
+        }
+
+
+class StatusServer:
+    def __init__(self, control: CrawlControl, identities: Optional[IdentityManager] = None, settings: Optional[Dict] = None) -> None:
+        """
+        Initializes the StatusServer class, an aiohttp web server running in the event loop of the crawler.
+
+        Endpoints:
+            GET  /status       - progress of the crawl and block rate per identity.
+            POST /pause        - stop starting new requests.
+            POST /resume       - start new requests again.
+            POST /concurrency  - change the concurrency limit, body {"limit": 10}, at most session_settings.limit.
+            POST /drain        - stop sending requests through a proxy, body {"proxy": "http://1.2.3.4:8080"}.
+
+        Parameters:
+            control (CrawlControl): The control of the running crawl.
+            identities (IdentityManager, optional): The identities whose block rates are reported.
+            settings (Dict, optional): The 'user_interface' section of the config file.
+                Loaded from the config file if not given.
+
+        Returns:
+            None
+        """
+        if settings is None:
+            settings = load_settings().get('user_interface', {})
+        self.control = control
+        self.identities = identities
+        self.host: str = settings.get('web_host', '127.0.0.1')
+        self.port: int = settings.get('web_port', 8080)
+        self.runner: Optional[web.AppRunner] = None
+
+    def create_app(self) -> web.Application:
+        app: web.Application = web.Application()
+        app.add_routes([
+            web.get('/', self.handle_status),
+            web.get('/status', self.handle_status),
+            web.post('/pause', self.handle_pause),
+            web.post('/resume', self.handle_resume),
+            web.post('/concurrency', self.handle_concurrency),
+            web.post('/drain', self.handle_drain),
+        ])
+        return app
+
+    async def start(self) -> None:
+        """
+        Starts serving on the configured host and port.
+
+        Raises:
+            OSError: If the port cannot be bound.
+        """
+        self.runner = web.AppRunner(self.create_app())
+        await self.runner.setup()
+        try:
+            await web.TCPSite(self.runner, self.host, self.port).start()
+        except OSError:
+            await self.stop()
+            raise
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+    async def handle_status(self, request: web.Request) -> web.Response:
+        status: Dict = self.control.get_status()
+        status['identities'] = self.identities.get_stats() if self.identities is not None else []
+        return web.json_response(status)
+
+    async def handle_pause(self, request: web.Request) -> web.Response:
+        await self.control.pause()
+        return web.json_response(self.control.get_status())
+
+    async def handle_resume(self, request: web.Request) -> web.Response:
+        await self.control.resume()
+        return web.json_response(self.control.get_status())
+
+    async def handle_concurrency(self, request: web.Request) -> web.Response:
+        try:
+            limit: int = int((await request.json())['limit'])
+        except Exception:
+            return web.json_response({'error': 'Body must be {"limit": <int>}'}, status=400)
+        if limit < 1:
+            return web.json_response({'error': 'Limit must be at least 1'}, status=400)
+        connection_limit: int = get_session_manager().limit
+        if connection_limit and limit > connection_limit:
+            return web.json_response({'error': f'Limit must not exceed the connection limit {connection_limit}'}, status=400)
+        await self.control.set_concurrency_limit(limit)
+        return web.json_response(self.control.get_status())
+
+    async def handle_drain(self, request: web.Request) -> web.Response:
+        try:
+            proxy: str = (await request.json())['proxy']
+        except Exception:
+            return web.json_response({'error': 'Body must be {"proxy": <str>}'}, status=400)
+        if not await self.control.drain_proxy(proxy):
+            return web.json_response({'error': f'Unknown proxy {proxy}'}, status=404)
+        return web.json_response(self.control.get_status())
+
+
+# Crawl control shared by all ResponseScraper objects for the life of the process
+_crawl_control: Optional[CrawlControl] = None
+
+
+def get_crawl_control() -> CrawlControl:
+    """
+    Returns the process-wide CrawlControl, creating it on first use.
+
+    Must be called from within a running event loop.
+
+    Returns:
+        CrawlControl: The shared crawl control.
+    """
+    global _crawl_control
+    if _crawl_control is None:
+        _crawl_control = CrawlControl(load_settings()['scraping_settings'].get('concurrency_limit', 100))
+    return _crawl_control